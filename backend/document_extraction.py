@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Optional extraction backends, resolved once at import
+try:
+    import fitz  # PyMuPDF
+    HAS_FITZ = True
+except ImportError:
+    HAS_FITZ = False
+
+try:
+    import pypdfium2 as pdfium
+    HAS_PDFIUM = True
+except ImportError:
+    HAS_PDFIUM = False
+
+try:
+    import PyPDF2
+    HAS_PYPDF2 = True
+except ImportError:
+    HAS_PYPDF2 = False
+
+try:
+    import pytesseract
+    from PIL import Image
+    HAS_TESSERACT = True
+except ImportError:
+    HAS_TESSERACT = False
+
+try:
+    from docx import Document
+    HAS_DOCX = True
+except ImportError:
+    HAS_DOCX = False
+
+try:
+    import diskcache
+    HAS_DISKCACHE = True
+except ImportError:
+    HAS_DISKCACHE = False
+
+logger = logging.getLogger(__name__)
+
+MIN_EXTRACTED_CHARS = 10
+
+# PyMuPDF is not thread-safe, so large PDFs are split into page batches across processes
+PARALLEL_PDF_MIN_PAGES = 16
+PDF_PAGE_BATCH_SIZE = 10
+# Every uvicorn worker has its own pool, so the cores are shared between them
+MAX_EXTRACTION_WORKERS = max(1, min(8, (os.cpu_count() or 1) // max(1, int(os.getenv("WORKERS", 1)))))
+OCR_DPI = 200
+
+# Extracted text of PDFs and images, keyed by a hash of the uploaded bytes
+EXTRACTION_CACHE_DIR = "./cache/ocr"
+
+_process_pool = None
+_extraction_cache = None
+_extraction_cache_failed = False
+# Uploads are extracted on threadpool threads, so lazy initialization must not race
+_init_lock = threading.Lock()
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Lazy create the shared extraction process pool"""
+    global _process_pool
+    if _process_pool is None:
+        with _init_lock:
+            if _process_pool is None:
+                # Forking the threaded server process can copy held locks into the children,
+                # so workers are started by a forkserver (spawn on Windows) instead
+                start_method = "spawn" if sys.platform == "win32" else "forkserver"
+                _process_pool = ProcessPoolExecutor(max_workers=MAX_EXTRACTION_WORKERS,
+                                                    mp_context=multiprocessing.get_context(start_method))
+    return _process_pool
+
+def get_extraction_cache():
+    """Lazy open the on-disk extraction cache (None if diskcache is unavailable)"""
+    global _extraction_cache, _extraction_cache_failed
+    if _extraction_cache is None and not _extraction_cache_failed and HAS_DISKCACHE:
+        with _init_lock:
+            if _extraction_cache is None and not _extraction_cache_failed:
+                try:
+                    _extraction_cache = diskcache.Cache(EXTRACTION_CACHE_DIR)
+                except Exception as e:
+                    logger.warning("Extraction cache not available: %s", e)
+                    _extraction_cache_failed = True
+    return _extraction_cache
+
+def _content_key(kind: str, file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"{kind}:{digest.hexdigest()}"
+
+def _cached_extraction(kind: str, file_path: str, extract) -> str:
+    """Return cached text for identical file contents, otherwise extract and cache successful results"""
+    cache = get_extraction_cache()
+    if cache is None:
+        return extract(file_path)[0]
+    key = _content_key(kind, file_path)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.debug("Using cached %s text for %s", kind, os.path.basename(file_path))
+        return cached
+    text, success = extract(file_path)
+    if success:
+        cache.set(key, text)
+    return text
+
+def _has_text(text: str) -> bool:
+    return bool(text) and len(text.strip()) >= MIN_EXTRACTED_CHARS
+
+def _map_page_batches(extract_batch, file_path: str, page_count: int) -> list[str]:
+    """Run a page-range extractor over the whole PDF, in parallel for large documents"""
+    starts = list(range(0, page_count, PDF_PAGE_BATCH_SIZE))
+    stops = [min(start + PDF_PAGE_BATCH_SIZE, page_count) for start in starts]
+    if page_count < PARALLEL_PDF_MIN_PAGES or MAX_EXTRACTION_WORKERS < 2:
+        batches = map(extract_batch, [file_path] * len(starts), starts, stops)
+    else:
+        batches = _get_process_pool().map(extract_batch, [file_path] * len(starts), starts, stops)
+    return [text for batch in batches for text in batch]
+
+def _pdf_page_count(file_path: str) -> int:
+    doc = fitz.open(file_path)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+def _pymupdf_page_range(file_path: str, start: int, stop: int) -> list[str]:
+    # Each worker opens its own handle; documents are never shared between processes
+    doc = fitz.open(file_path)
+    try:
+        return [doc[i].get_text("text") for i in range(start, stop)]
+    finally:
+        doc.close()
+
+def _ocr_page_range(file_path: str, start: int, stop: int) -> list[str]:
+    doc = fitz.open(file_path)
+    try:
+        texts = []
+        for i in range(start, stop):
+            pixmap = doc[i].get_pixmap(dpi=OCR_DPI)
+            image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+            texts.append(pytesseract.image_to_string(image, timeout=10))
+        return texts
+    finally:
+        doc.close()
+
+def _extract_with_pymupdf(file_path: str) -> str:
+    return "\n".join(_map_page_batches(_pymupdf_page_range, file_path, _pdf_page_count(file_path)))
+
+def _extract_with_ocr(file_path: str) -> str:
+    # Scanned PDFs: rasterize and OCR pages; Tesseract is CPU-bound so this uses processes, not threads
+    return "\n".join(_map_page_batches(_ocr_page_range, file_path, _pdf_page_count(file_path)))
+
+def _extract_with_pypdfium2(file_path: str) -> str:
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return "\n".join(page.get_textpage().get_text_range() for page in pdf)
+    finally:
+        pdf.close()
+
+def _extract_with_pypdf2(file_path: str) -> str:
+    with open(file_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        return "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
+
+PDF_EXTRACTORS = [
+    ("PyMuPDF", HAS_FITZ, _extract_with_pymupdf),
+    ("pypdfium2", HAS_PDFIUM, _extract_with_pypdfium2),
+    ("PyPDF2", HAS_PYPDF2, _extract_with_pypdf2),
+    ("Tesseract OCR", HAS_FITZ and HAS_TESSERACT, _extract_with_ocr),
+]
+
+def _extract_pdf_text(file_path: str) -> tuple[str, bool]:
+    extracted_text = ""
+    for name, available, extractor in PDF_EXTRACTORS:
+        if not available:
+            logger.debug("%s not available", name)
+            if not extracted_text:
+                extracted_text = f"PDF processing not available - {name} not installed"
+            continue
+        try:
+            text = extractor(file_path)
+            logger.debug("%s extracted %d characters", name, len(text))
+        except Exception as e:
+            logger.warning("%s error: %s", name, e)
+            if not extracted_text:
+                extracted_text = f"PDF processing error: {str(e)}"
+            continue
+        if _has_text(text):
+            return text, True
+
+    # Final fallback - try to read as text (some PDFs are actually text)
+    logger.debug("Trying text fallback...")
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            fallback_text = f.read()
+            if _has_text(fallback_text):
+                logger.debug("Fallback text extraction: %d characters", len(fallback_text))
+                return fallback_text, True
+    except Exception as e:
+        logger.warning("Fallback text error: %s", e)
+    return extracted_text, False
+
+def extract_pdf_text(file_path: str) -> str:
+    """Extract PDF text, trying the C-backed parsers before PyPDF2"""
+    return _cached_extraction("pdf", file_path, _extract_pdf_text)
+
+def _extract_image_text(file_path: str) -> tuple[str, bool]:
+    if not HAS_TESSERACT:
+        logger.debug("OCR not available")
+        return "OCR processing not available - pytesseract not installed", False
+    try:
+        image = Image.open(file_path)
+        extracted_text = pytesseract.image_to_string(image, timeout=10)  # Add timeout
+        logger.debug("OCR processing completed")
+        return extracted_text, True
+    except Exception as e:
+        logger.warning("OCR error: %s", e)
+        return f"OCR processing error: {str(e)}", False
+
+def extract_image_text(file_path: str) -> str:
+    """OCR an uploaded image"""
+    return _cached_extraction("image", file_path, _extract_image_text)
+
+def extract_docx_text(file_path: str) -> str:
+    """Extract paragraph text from a Word document"""
+    if not HAS_DOCX:
+        return "Word document processing not available - python-docx not installed"
+    try:
+        doc = Document(file_path)
+        return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
+    except Exception as e:
+        return f"Word document processing error: {str(e)}"
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# UTF-8 never needs more than 4 bytes per character
+MAX_UTF8_BYTES_PER_CHAR = 4
+
+# Uploads are bounded: least recently used documents beyond MAX_DOCUMENTS are evicted,
+# and every document expires DOCUMENT_TTL_SECONDS after upload
+MAX_DOCUMENTS = int(os.getenv("MAX_DOCUMENTS", 128))
+DOCUMENT_TTL_SECONDS = float(os.getenv("DOCUMENT_TTL_SECONDS", 3600))
+
+# last_access only needs to be coarse for eviction; writing it less often keeps
+# /ask from committing (and bumping every worker's data_version) on each request
+TOUCH_INTERVAL_SECONDS = float(os.getenv("TOUCH_INTERVAL_SECONDS", 60))
+
+def _frozen_array(values, dtype) -> np.ndarray:
+    array = np.array(values, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+@dataclass(frozen=True)
+class DocumentSnapshot:
+    """One consistent view of the uploaded documents as parallel arrays"""
+    names: tuple[str, ...] = ()
+    paths: tuple[str, ...] = ()
+    upload_times: np.ndarray = field(default_factory=lambda: _frozen_array([], np.float64))
+    lengths: np.ndarray = field(default_factory=lambda: _frozen_array([], np.int64))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+@dataclass
+class DocumentStore:
+    """Uploaded documents; extracted text lives on disk and is read through mmap.
+
+    The document list is kept in a SQLite manifest so every server worker process sees
+    the same uploads. refresh() picks up other workers' changes, evicts expired documents
+    and returns the current snapshot. Snapshots are replaced, never modified, so a request
+    should take one and read only from it.
+    """
+    text_dir: Path
+    db_path: Path
+    max_documents: int = MAX_DOCUMENTS
+    ttl_seconds: float = DOCUMENT_TTL_SECONDS
+    touch_interval_seconds: float = TOUCH_INTERVAL_SECONDS
+    snapshot: DocumentSnapshot = field(default_factory=DocumentSnapshot)
+    _maps: dict = field(default_factory=dict, repr=False)
+    _touched: dict = field(default_factory=dict, repr=False)
+    _connection: Optional[sqlite3.Connection] = field(default=None, repr=False)
+    _data_version: Optional[int] = field(default=None, repr=False)
+    _lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.snapshot.names
+
+    def text_path(self, name: str) -> Path:
+        return Path(self.text_dir) / f"{name}.txt"
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "name TEXT PRIMARY KEY, path TEXT NOT NULL, upload_time REAL NOT NULL, length INTEGER NOT NULL, "
+                "last_access REAL NOT NULL DEFAULT 0)"
+            )
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(documents)")]
+            if "last_access" not in columns:
+                self._connection.execute("ALTER TABLE documents ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+            self._connection.commit()
+        return self._connection
+
+    def refresh(self) -> DocumentSnapshot:
+        """Reload the snapshot if the manifest changed since the last load, and return it"""
+        with self._lock:
+            connection = self._connect()
+            if self._evict(connection, time.time()):
+                self._data_version = None
+            data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return self.snapshot
+            rows = connection.execute("SELECT name, path, upload_time, length FROM documents ORDER BY rowid").fetchall()
+            previous = dict(zip(self.snapshot.names, self.snapshot.upload_times))
+            snapshot = DocumentSnapshot(
+                names=tuple(row[0] for row in rows),
+                paths=tuple(row[1] for row in rows),
+                upload_times=_frozen_array([row[2] for row in rows], np.float64),
+                lengths=_frozen_array([row[3] for row in rows], np.int64)
+            )
+            # Published with a single assignment, so readers never see arrays from two loads
+            self.snapshot = snapshot
+            self._data_version = data_version
+            # Drop maps of documents that were removed or replaced by another worker
+            current = dict(zip(snapshot.names, snapshot.upload_times))
+            for name in list(self._maps):
+                if current.get(name) != previous.get(name):
+                    self._close_map(name)
+            return snapshot
+
+    def add(self, name: str, file_path: str, text: str, upload_time: float):
+        """Store a document's extracted text on disk, replacing any previous upload with the same name"""
+        with self._lock:
+            self._close_map(name)
+            text_path = self.text_path(name)
+            text_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so maps held by other workers keep the old file intact
+            tmp_path = text_path.with_name(f"{text_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, text_path)
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO documents (name, path, upload_time, length, last_access) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET path=excluded.path, upload_time=excluded.upload_time, "
+                "length=excluded.length, last_access=excluded.last_access",
+                (name, file_path, upload_time, len(text), upload_time)
+            )
+            connection.commit()
+            self._touched[name] = upload_time
+            # data_version does not change for this connection's own writes
+            self._data_version = None
+            self.refresh()
+
+    def touch(self, names):
+        """Mark documents as used, for least-recently-used eviction.
+
+        Writes are throttled to once per touch_interval_seconds per document, so
+        last_access is only accurate to that interval.
+        """
+        with self._lock:
+            now = time.time()
+            cutoff = now - self.touch_interval_seconds
+            stale = [name for name in names if self._touched.get(name, 0) < cutoff]
+            if not stale:
+                return
+            connection = self._connect()
+            # Another worker may have touched the document recently; skip the write then too
+            updated = connection.executemany(
+                "UPDATE documents SET last_access = ? WHERE name = ? AND last_access < ?",
+                [(now, name, cutoff) for name in stale]
+            ).rowcount
+            if updated:
+                connection.commit()
+            for name in stale:
+                self._touched[name] = now
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> bool:
+        """Delete expired and least recently used documents over the limit, with their files"""
+        cutoff = now - self.ttl_seconds
+        expired = connection.execute(
+            "SELECT name, path, upload_time FROM documents WHERE upload_time < ?", (cutoff,)
+        ).fetchall()
+        overflow = connection.execute(
+            "SELECT name, path, upload_time FROM documents WHERE upload_time >= ? ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+            (cutoff, self.max_documents)
+        ).fetchall()
+        victims = []
+        for name, path, upload_time in expired + overflow:
+            # Match the version too, so a row re-uploaded since the SELECT is left alone
+            if connection.execute(
+                "DELETE FROM documents WHERE name = ? AND upload_time = ?", (name, upload_time)
+            ).rowcount:
+                victims.append((name, path, upload_time))
+        if not victims:
+            return False
+        connection.commit()
+        for name, path, upload_time in victims:
+            self._close_map(name)
+            self._touched.pop(name, None)
+            self._unlink(self.text_path(name))
+            # A re-upload under the same name overwrites the raw file before its row is
+            # stored; a file modified after this row's upload belongs to that newer upload
+            try:
+                if os.stat(path).st_mtime <= upload_time:
+                    self._unlink(Path(path))
+            except OSError:
+                pass
+        return True
+
+    @staticmethod
+    def _unlink(path: Path):
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    def read(self, name: str, limit: Optional[int] = None) -> str:
+        """Return a document's text, or only its first `limit` characters"""
+        with self._lock:
+            mm = self._get_map(name)
+            if mm is None:
+                return ""
+            if limit is None:
+                return mm[:].decode("utf-8")
+            # Decode just enough bytes for `limit` characters, dropping a split trailing character
+            return mm[:limit * MAX_UTF8_BYTES_PER_CHAR].decode("utf-8", errors="ignore")[:limit]
+
+    def _get_map(self, name: str) -> Optional[mmap.mmap]:
+        mm = self._maps.get(name)
+        if mm is None:
+            path = self.text_path(name)
+            if not path.exists() or path.stat().st_size == 0:
+                return None
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[name] = mm
+        return mm
+
+    def _close_map(self, name: str):
+        mm = self._maps.pop(name, None)
+        if mm is not None:
+            mm.close()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Optional, Dict, Any
+
+import numpy as np
+
+try:
+    import diskcache
+    HAS_DISKCACHE = True
+except ImportError:
+    HAS_DISKCACHE = False
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+
+EMBEDDING_CACHE_DIR = "./cache/embeddings"
+EMBEDDING_BATCH_SIZE = 64
+
+# MiniLM truncates at 256 word pieces, so chunks stay well under that
+CHUNK_WORDS = 160
+CHUNK_OVERLAP_WORDS = 32
+RETRIEVAL_TOP_K = 5
+
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MAX_ENTRIES = 1024
+SEMANTIC_CACHE_TTL_SECONDS = 3600
+
+_embedding_model = None
+_embedding_model_failed = False
+_embedding_model_lock = threading.Lock()
+_embedding_store = None
+_embedding_store_failed = False
+
+def get_embedding_model():
+    """Lazy load the sentence embedding model (None if sentence-transformers is unavailable)"""
+    global _embedding_model, _embedding_model_failed
+    if _embedding_model is None and not _embedding_model_failed:
+        with _embedding_model_lock:
+            if _embedding_model is None and not _embedding_model_failed:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                except Exception as e:
+                    logger.warning("Embedding model not available: %s", e)
+                    _embedding_model_failed = True
+    return _embedding_model
+
+def get_embedding_store():
+    """Lazy open the on-disk embedding cache (None if diskcache is unavailable)"""
+    global _embedding_store, _embedding_store_failed
+    if _embedding_store is None and not _embedding_store_failed and HAS_DISKCACHE:
+        try:
+            _embedding_store = diskcache.Cache(EMBEDDING_CACHE_DIR)
+        except Exception as e:
+            logger.warning("Embedding cache not available: %s", e)
+            _embedding_store_failed = True
+    return _embedding_store
+
+def _embedding_key(text: str) -> bytes:
+    """Content hash of a text, scoped to the embedding model"""
+    return hashlib.sha256(f"{EMBEDDING_MODEL_NAME}\0{text}".encode()).digest()
+
+def embed_texts(texts: list[str]) -> Optional[np.ndarray]:
+    """Embed texts as an (N, D) float32 matrix of unit-length rows, encoding cache misses in one batch"""
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    
+    store = get_embedding_store()
+    keys = [_embedding_key(text) for text in texts]
+    vectors = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    missing = []
+    for i, key in enumerate(keys):
+        cached = store.get(key) if store is not None else None
+        if cached is not None:
+            vectors[i] = np.frombuffer(cached, dtype=np.float32)
+        else:
+            missing.append(i)
+    
+    if missing:
+        model = get_embedding_model()
+        if model is None:
+            return None
+        encoded = model.encode(
+            [texts[i] for i in missing],
+            batch_size=EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).astype(np.float32)
+        vectors[missing] = encoded
+        if store is not None:
+            # Raw float32 bytes are a quarter the size of a pickled float64 array
+            with store.transact():
+                for i, vector in zip(missing, encoded):
+                    store.set(keys[i], vector.tobytes())
+    return vectors
+
+def embed_text(text: str) -> Optional[np.ndarray]:
+    """Embed a single text as a unit-length float32 vector, reusing persisted embeddings"""
+    vectors = embed_texts([text])
+    return None if vectors is None else vectors[0]
+
+def chunk_text(text: str, chunk_words: int = CHUNK_WORDS, overlap_words: int = CHUNK_OVERLAP_WORDS) -> list[str]:
+    """Split text into overlapping word windows"""
+    words = text.split()
+    if not words:
+        return []
+    step = chunk_words - overlap_words
+    return [" ".join(words[start:start + chunk_words]) for start in range(0, max(len(words) - overlap_words, 1), step)]
+
+class DocumentIndex:
+    """Chunk embeddings for uploaded documents, kept as one contiguous (N, D) matrix"""
+
+    def __init__(self):
+        self.embeddings = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.chunk_texts: list[str] = []
+        self.chunk_sources: list[str] = []
+        self.versions: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def add_document(self, name: str, text: str, version: float = 0.0) -> int:
+        """Chunk and batch-embed a document, replacing any previous version; returns the chunk count"""
+        chunks = chunk_text(text)
+        vectors = embed_texts(chunks)
+        if vectors is None:
+            return 0
+        with self.lock:
+            self._drop(name)
+            self.versions[name] = version
+            self.embeddings = np.ascontiguousarray(np.vstack([self.embeddings, vectors]))
+            self.chunk_texts.extend(chunks)
+            self.chunk_sources.extend([name] * len(chunks))
+        return len(chunks)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = RETRIEVAL_TOP_K, max_chars: Optional[int] = None) -> list[tuple[str, str]]:
+        """Return (document name, chunk text) for the chunks most similar to the query.
+
+        Chunks are picked by similarity (within max_chars, if given) but returned in
+        index order, so questions that retrieve the same chunks produce the same prompt prefix.
+        """
+        with self.lock:
+            if not self.chunk_texts:
+                return []
+            scores = self.embeddings @ query_embedding
+            k = min(top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            selected = []
+            total_chars = 0
+            for i in top:
+                total_chars += len(self.chunk_texts[i])
+                if selected and max_chars is not None and total_chars > max_chars:
+                    break
+                selected.append(int(i))
+            return [(self.chunk_sources[i], self.chunk_texts[i]) for i in sorted(selected)]
+
+    def remove_document(self, name: str):
+        """Drop all chunks belonging to a document"""
+        with self.lock:
+            self._drop(name)
+
+    def sync(self, names: list[str], versions, read_text):
+        """Index documents added or replaced elsewhere (e.g. by another worker) and drop removed ones"""
+        current = dict(zip(names, versions))
+        # Snapshot under the lock; /upload may be adding documents from another thread
+        with self.lock:
+            indexed = dict(self.versions)
+        for name in [name for name in indexed if name not in current]:
+            self.remove_document(name)
+        for name, version in current.items():
+            if indexed.get(name) != version:
+                self.add_document(name, read_text(name), version)
+
+    def _drop(self, name: str):
+        self.versions.pop(name, None)
+        keep = [i for i, source in enumerate(self.chunk_sources) if source != name]
+        if len(keep) == len(self.chunk_sources):
+            return
+        self.embeddings = np.ascontiguousarray(self.embeddings[keep])
+        self.chunk_texts = [self.chunk_texts[i] for i in keep]
+        self.chunk_sources = [self.chunk_sources[i] for i in keep]
+
+def quantize_int8(vector: np.ndarray) -> tuple[np.ndarray, float]:
+    """Symmetric per-vector int8 quantization; returns (int8 vector, scale)"""
+    scale = float(np.abs(vector).max()) / 127 or 1.0
+    return np.round(vector / scale).astype(np.int8), scale
+
+class SemanticQueryCache:
+    """Reuses answers for near-duplicate queries by cosine similarity of their embeddings.
+    Embeddings are stored as int8 with a per-row scale, a quarter of the float32 footprint.
+
+    Embeddings barely separate "Section 302" from "Section 304", so an entry only
+    matches queries with the same numeric tokens (section numbers, years, ...).
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stored_at = np.zeros(max_entries, dtype=np.float64)
+        self.embeddings = np.zeros((max_entries, EMBEDDING_DIM), dtype=np.int8)
+        self.scales = np.zeros(max_entries, dtype=np.float32)
+        self.results: list[Optional[Dict[str, Any]]] = [None] * max_entries
+        self.numbers: list[tuple] = [()] * max_entries
+        self.count = 0
+        self.next_slot = 0
+        self.fingerprint = None
+        self.lock = threading.Lock()
+
+    def _reset(self, fingerprint: str):
+        self.results = [None] * self.max_entries
+        self.numbers = [()] * self.max_entries
+        self.count = 0
+        self.next_slot = 0
+        self.fingerprint = fingerprint
+
+    def lookup(self, query_embedding: np.ndarray, fingerprint: str, numbers: tuple = ()) -> Optional[Dict[str, Any]]:
+        """Return the cached result of the most similar query above the threshold with the same numeric tokens"""
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                self._reset(fingerprint)
+                return None
+            if self.count == 0:
+                return None
+            # Embeddings are unit length, so a single integer matmul, rescaled, gives the cosine similarities
+            query_int8, query_scale = quantize_int8(query_embedding)
+            dots = np.matmul(self.embeddings[:self.count], query_int8, dtype=np.int32)
+            scores = dots * (self.scales[:self.count] * query_scale)
+            scores[self.stored_at[:self.count] < time.time() - self.ttl_seconds] = -np.inf
+            scores[[entry != numbers for entry in self.numbers[:self.count]]] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] > self.threshold:
+                return self.results[best]
+            return None
+
+    def store(self, query_embedding: np.ndarray, fingerprint: str, result: Dict[str, Any], numbers: tuple = ()):
+        """Add a result, overwriting the oldest entry once the cache is full"""
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                self._reset(fingerprint)
+            self.embeddings[self.next_slot], self.scales[self.next_slot] = quantize_int8(query_embedding)
+            self.results[self.next_slot] = result
+            self.numbers[self.next_slot] = numbers
+            self.stored_at[self.next_slot] = time.time()
+            self.next_slot = (self.next_slot + 1) % self.max_entries
+            self.count = min(self.count + 1, self.max_entries)
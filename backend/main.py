@@ -2,24 +2,78 @@
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, JSONResponse, ORJSONResponse
 from pydantic import BaseModel
 import uvicorn
+import asyncio
 import json
 import time
 import queue
+import hashlib
+import io
+import re
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 import os
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
 
 from utils_fast import ask_indian_legalgpt_fast, upload_document_to_rag_fast, process_voice_input_fast
-from utils_fast import generate_legal_document_fast
+from utils_fast import generate_legal_document_fast, ask_groq_fast, knowledge_base_answer, GROQ_MODEL
 from speech_features import get_speech_processor
+from embeddings_fast import embed_text, SemanticQueryCache, DocumentIndex
+from document_store import DocumentStore, DocumentSnapshot
+from document_extraction import extract_pdf_text, extract_image_text, extract_docx_text
+
+def _configure_logging():
+    """Hand log records to a queue that a background thread writes to stderr"""
+    if logging.getLogger().handlers:
+        return
+    log_queue = queue.Queue(-1)
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log_listener = QueueListener(log_queue, log_handler)
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), handlers=[queue_handler])
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
+logger = logging.getLogger(__name__)
+
+# Handlers with large nested payloads return this class directly, which skips
+# FastAPI's jsonable_encoder pass over the content
+JSON_RESPONSE_CLASS = ORJSONResponse if HAS_ORJSON else JSONResponse
 
 app = FastAPI(
     title="Advanced Legal AI Assistant",
     description="Resume-worthy legal AI with custom fine-tuning, multi-modal processing, and advanced document analysis",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=JSON_RESPONSE_CLASS
 )
 
+# Configured at startup rather than import, so processes that merely import this
+# module (e.g. multiprocessing children) do not start a listener thread
+app.on_event("startup")(_configure_logging)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -44,7 +98,24 @@ document_analyzer = None
 multimodal_ai = None
 
 # Global document storage for RAG
-uploaded_documents = {}
+# Kept outside uploads/ so an uploaded filename can never collide with the manifest or text store
+uploaded_documents = DocumentStore(Path("cache") / "text", Path("cache") / "documents.db")
+
+# Chunk embeddings of uploaded documents for retrieval
+document_index = DocumentIndex()
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Upper bound on document text sent with each question
+CONTEXT_CHAR_BUDGET = 3000
+
+# Exact-match cache of /ask results keyed by (normalized query, documents fingerprint, model)
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL_SECONDS = 3600
+response_cache = OrderedDict()
+
+# Second-tier cache that matches paraphrased queries by embedding similarity
+semantic_cache = SemanticQueryCache()
 
 def get_document_analyzer():
     """Lazy load document analyzer"""
@@ -62,6 +133,41 @@ def get_multimodal_ai():
         multimodal_ai = MultiModalLegalAI()
     return multimodal_ai
 
+def _sendfile_copy(source_fd: int, target_fd: int):
+    """Copy a whole file inside the kernel, without bouncing chunks through user space"""
+    remaining = os.fstat(source_fd).st_size
+    offset = 0
+    while remaining > 0:
+        sent = os.sendfile(target_fd, source_fd, offset, min(remaining, 1 << 30))
+        if sent == 0:
+            break
+        offset += sent
+        remaining -= sent
+
+def _is_disk_backed(source) -> bool:
+    """True if an upload's bytes are in a real file that sendfile can read"""
+    if isinstance(source, tempfile.SpooledTemporaryFile):
+        # Large uploads are spooled to a temp file on disk; fileno() on a small in-memory
+        # spool would force it to disk, so only rolled-over spools qualify
+        return bool(getattr(source, "_rolled", False))
+    return isinstance(source, (io.FileIO, io.BufferedReader, io.BufferedRandom))
+
+def _copy_upload(source, file_path: Path):
+    with open(file_path, "wb") as buffer:
+        if sys.platform.startswith("linux") and _is_disk_backed(source):
+            try:
+                _sendfile_copy(source.fileno(), buffer.fileno())
+                return
+            except (OSError, AttributeError, io.UnsupportedOperation):
+                buffer.seek(0)
+                buffer.truncate()
+                source.seek(0)
+        shutil.copyfileobj(source, buffer, UPLOAD_CHUNK_SIZE)
+
+async def _save_upload(upload: UploadFile, file_path: Path):
+    """Stream an uploaded file to disk in 1 MiB chunks off the event loop"""
+    await run_in_threadpool(_copy_upload, upload.file, file_path)
+
 class ChatRequest(BaseModel):
     query: str
 
@@ -81,80 +187,180 @@ class TextToSpeechRequest(BaseModel):
     text: str
     save_audio: bool = False
 
+# Static responses are serialized once at import
+ROOT_JSON = json.dumps({
+    "message": "Advanced Legal AI Assistant",
+    "version": "2.0.0",
+    "features": [
+        "Custom fine-tuned legal model",
+        "Multi-modal AI processing",
+        "Advanced document analysis",
+        "Enhanced RAG system",
+        "Legal risk assessment",
+        "Voice interface",
+        "OCR document processing"
+    ],
+    "status": "Resume-worthy legal AI application"
+}).encode()
+
 @app.get("/")
 async def root():
     """Root endpoint with project information"""
-    return {
-        "message": "Advanced Legal AI Assistant",
-        "version": "2.0.0",
-        "features": [
-            "Custom fine-tuned legal model",
-            "Multi-modal AI processing",
-            "Advanced document analysis",
-            "Enhanced RAG system",
-            "Legal risk assessment",
-            "Voice interface",
-            "OCR document processing"
-        ],
-        "status": "Resume-worthy legal AI application"
-    }
+    return Response(ROOT_JSON, media_type="application/json")
+
+def _normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups"""
+    return " ".join(query.lower().split())
+
+def _query_numbers(query: str) -> tuple:
+    """Numeric tokens of a normalized query (e.g. section numbers like 302 or 498a)"""
+    return tuple(re.findall(r"\d+[a-z]*", query))
+
+def _documents_fingerprint(documents: DocumentSnapshot) -> str:
+    """Hash an uploaded document set so cached answers follow document changes"""
+    digest = hashlib.blake2b(digest_size=16)
+    for key in sorted(f"{filename}\0{upload_time}" for filename, upload_time in zip(documents.names, documents.upload_times)):
+        digest.update(key.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _leading_document_context(documents: DocumentSnapshot) -> tuple[list[str], set]:
+    """Context parts from the start of each document, up to the context budget"""
+    context_parts = []
+    used_documents = set()
+    context_length = 0
+    for filename, content_length in zip(documents.names, documents.lengths):
+        if context_length >= CONTEXT_CHAR_BUDGET:
+            break
+        logger.debug("Processing document: %s (%d characters)", filename, content_length)
+        part = f"\n\nDocument: {filename}\nContent: {uploaded_documents.read(filename, 2000)}...\n"
+        context_parts.append(part)
+        used_documents.add(filename)
+        context_length += len(part)
+    return context_parts, used_documents
+
+def _get_cached_answer(cache_key: tuple):
+    """Return an unexpired cached /ask result and mark it as recently used"""
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        return None
+    stored_at, cached = entry
+    if time.time() - stored_at > RESPONSE_CACHE_TTL_SECONDS:
+        del response_cache[cache_key]
+        return None
+    response_cache.move_to_end(cache_key)
+    return cached
+
+def _store_cached_answer(cache_key: tuple, result: dict):
+    """Insert an /ask result, evicting the least recently used entry when full"""
+    response_cache[cache_key] = (time.time(), result)
+    response_cache.move_to_end(cache_key)
+    while len(response_cache) > RESPONSE_CACHE_SIZE:
+        response_cache.popitem(last=False)
 
 @app.post("/ask")
 async def ask_question(request: ChatRequest):
     """Ultra-fast legal Q&A with RAG from uploaded documents"""
     try:
-        print(f"Question received: {request.query}")
-        print(f"Uploaded documents count: {len(uploaded_documents)}")
-        print(f"Document keys: {list(uploaded_documents.keys())}")
+        logger.debug("Question received: %s", request.query)
+        
+        # Refreshing may evict documents (SQLite writes, file unlinks), so keep it off the event loop
+        documents = await run_in_threadpool(uploaded_documents.refresh)
+        documents_fingerprint = _documents_fingerprint(documents)
+        normalized_query = _normalize_query(request.query)
+        query_numbers = _query_numbers(normalized_query)
+        cache_key = (normalized_query, documents_fingerprint, GROQ_MODEL)
+        cached = _get_cached_answer(cache_key)
+        if cached is not None:
+            logger.debug("Serving answer from response cache")
+        
+        query_embedding = None
+        if cached is None:
+            query_embedding = await run_in_threadpool(embed_text, request.query)
+            if query_embedding is not None:
+                cached = semantic_cache.lookup(query_embedding, documents_fingerprint, query_numbers)
+                if cached is not None:
+                    logger.debug("Serving answer from semantic cache")
+        
+        if cached is not None:
+            # Cache hits still count as use of the documents the answer was built from
+            await run_in_threadpool(uploaded_documents.touch, cached["documents"])
+            return JSON_RESPONSE_CLASS({
+                "response": cached["response"],
+                "analysis": {**cached["analysis"], "query": request.query}
+            })
+        
+        # Classification does not depend on the answer, so overlap it with retrieval and the LLM call
+        domain_task = asyncio.create_task(run_in_threadpool(_classify_legal_domain, request.query))
+        
+        logger.debug("Uploaded documents count: %d", len(documents))
+        logger.debug("Document keys: %s", documents.names)
         
+        used_documents = set()
         # Check if we have uploaded documents to use for RAG
-        if uploaded_documents:
-            print("Using uploaded documents for RAG")
-            # Use the uploaded documents for context
-            document_context = ""
-            for filename, doc_info in uploaded_documents.items():
-                print(f"Processing document: {filename}")
-                print(f"Document content length: {len(doc_info['content'])}")
-                document_context += f"\n\nDocument: {filename}\nContent: {doc_info['content'][:2000]}...\n"
+        if documents:
+            logger.debug("Using uploaded documents for RAG")
+            # Send only the chunks most relevant to the question, in stable document order
+            if query_embedding is not None:
+                await run_in_threadpool(
+                    document_index.sync, documents.names, documents.upload_times, uploaded_documents.read
+                )
+            retrieved_chunks = (
+                document_index.search(query_embedding, max_chars=CONTEXT_CHAR_BUDGET)
+                if query_embedding is not None else []
+            )
+            if retrieved_chunks:
+                logger.debug("Retrieved %d relevant chunks", len(retrieved_chunks))
+                context_parts = [f"\n\nDocument: {filename}\nExcerpt: {chunk}\n" for filename, chunk in retrieved_chunks]
+                used_documents = {filename for filename, _ in retrieved_chunks}
+            else:
+                # Embeddings unavailable - fall back to the start of every document
+                context_parts, used_documents = await run_in_threadpool(_leading_document_context, documents)
+            document_context = "".join(context_parts)
+            await run_in_threadpool(uploaded_documents.touch, used_documents)
+            document_context = document_context[:CONTEXT_CHAR_BUDGET]
             
-            # Create enhanced query with document context
-            enhanced_query = f"""
-            Question: {request.query}
+            logger.debug("Document context length: %d", len(document_context))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Document context preview: %s...", document_context[:500])
             
-            Context from uploaded documents:
-            {document_context}
-            
-            Please answer the question based on the uploaded documents. If the documents don't contain relevant information, provide general Indian legal guidance.
-            """
-            
-            print(f"Enhanced query length: {len(enhanced_query)}")
-            print(f"Enhanced query preview: {enhanced_query[:500]}...")
-            
-            response = ask_indian_legalgpt_fast(enhanced_query)
+            response = await run_in_threadpool(ask_groq_fast, request.query, document_context)
         else:
-            print("No documents uploaded, using regular legal knowledge")
+            logger.debug("No documents uploaded, using regular legal knowledge")
             # No documents uploaded, use regular legal knowledge
-            response = ask_indian_legalgpt_fast(request.query)
+            response = await run_in_threadpool(ask_groq_fast, request.query)
         
-        print(f"Response received: {response[:200]}...")
+        # Knowledge-base answers stand in for a Groq failure and are never cached
+        answered_by_llm = response is not None
+        if not answered_by_llm:
+            logger.warning("Groq unavailable, answering from the knowledge base")
+            response = knowledge_base_answer(request.query)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response received: %s...", response[:200])
         
         analysis = {
             "query": request.query,
             "response": response,
-            "legal_domain": _classify_legal_domain(request.query),
+            "legal_domain": await domain_task,
             "confidence_score": 0.95,
-            "sources": ["Uploaded Documents"] if uploaded_documents else ["Indian Constitution", "IPC", "Civil Laws"],
+            "sources": ["Uploaded Documents"] if documents else ["Indian Constitution", "IPC", "Civil Laws"],
             "advanced_features": [
-                "RAG from uploaded documents" if uploaded_documents else "General legal knowledge",
+                "RAG from uploaded documents" if documents else "General legal knowledge",
                 "Document context awareness",
                 "Multi-domain knowledge"
             ]
         }
         
-        return {"response": response, "analysis": analysis}
+        cached_result = {"response": response, "analysis": analysis, "documents": sorted(used_documents)}
+        if answered_by_llm:
+            _store_cached_answer(cache_key, cached_result)
+        if answered_by_llm and query_embedding is not None:
+            semantic_cache.store(query_embedding, documents_fingerprint, cached_result, query_numbers)
+        return JSON_RESPONSE_CLASS({"response": response, "analysis": analysis})
     
     except Exception as e:
-        print(f"Error in ask endpoint: {e}")
+        logger.exception("Error in ask endpoint: %s", e)
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @app.post("/upload")
@@ -167,98 +373,20 @@ async def upload_document(file: UploadFile = File(...)):
         file_path = upload_dir / file.filename
         
         # Save file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        await _save_upload(file, file_path)
         
         # Extract text based on file type
         extracted_text = ""
-        print(f"Processing file: {file.filename}")
-        print(f"File path: {file_path}")
+        logger.debug("Processing file: %s", file_path)
         
         if file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-            try:
-                import pytesseract
-                from PIL import Image
-                image = Image.open(file_path)
-                extracted_text = pytesseract.image_to_string(image, timeout=10)  # Add timeout
-                print("OCR processing completed")
-            except ImportError:
-                extracted_text = "OCR processing not available - pytesseract not installed"
-                print("OCR not available")
-            except Exception as e:
-                extracted_text = f"OCR processing error: {str(e)}"
-                print(f"OCR error: {e}")
+            extracted_text = await run_in_threadpool(extract_image_text, str(file_path))
         elif file.filename.lower().endswith(('.pdf')):
-            print("Processing PDF file...")
-            # Try PyPDF2 first
-            try:
-                import PyPDF2
-                print("PyPDF2 imported successfully")
-                with open(file_path, 'rb') as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    extracted_text = ""
-                    for page_num, page in enumerate(pdf_reader.pages):
-                        page_text = page.extract_text()
-                        if page_text:
-                            extracted_text += page_text + "\n"
-                            print(f"Page {page_num + 1}: {len(page_text)} characters")
-                        else:
-                            print(f"Page {page_num + 1}: No text extracted")
-                print(f"PyPDF2 extracted {len(extracted_text)} characters")
-            except ImportError:
-                print("PyPDF2 not available")
-                extracted_text = "PDF processing not available - PyPDF2 not installed"
-            except Exception as e:
-                print(f"PyPDF2 error: {e}")
-                extracted_text = f"PDF processing error: {str(e)}"
-                
-            # If no text extracted, try alternative method
-            if not extracted_text or len(extracted_text.strip()) < 10:
-                print("Trying alternative PDF method...")
-                try:
-                    import fitz  # PyMuPDF
-                    print("PyMuPDF imported successfully")
-                    doc = fitz.open(file_path)
-                    extracted_text = ""
-                    for page_num, page in enumerate(doc):
-                        page_text = page.get_text()
-                        extracted_text += page_text + "\n"
-                        print(f"PyMuPDF Page {page_num + 1}: {len(page_text)} characters")
-                    doc.close()
-                    print(f"PyMuPDF extracted {len(extracted_text)} characters")
-                except ImportError:
-                    print("PyMuPDF not available")
-                    if not extracted_text:
-                        extracted_text = "PDF processing not available - PyMuPDF not installed"
-                except Exception as e:
-                    print(f"PyMuPDF error: {e}")
-                    if not extracted_text:
-                        extracted_text = f"Alternative PDF processing error: {str(e)}"
-                        
-            # Final fallback - try to read as text (some PDFs are actually text)
-            if not extracted_text or len(extracted_text.strip()) < 10:
-                print("Trying text fallback...")
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        fallback_text = f.read()
-                        if len(fallback_text.strip()) > 10:
-                            extracted_text = fallback_text
-                            print(f"Fallback text extraction: {len(extracted_text)} characters")
-                except Exception as e:
-                    print(f"Fallback text error: {e}")
+            logger.debug("Processing PDF file...")
+            extracted_text = await run_in_threadpool(extract_pdf_text, str(file_path))
                             
         elif file.filename.lower().endswith(('.docx', '.doc')):
-            try:
-                from docx import Document
-                doc = Document(file_path)
-                extracted_text = ""
-                for paragraph in doc.paragraphs:
-                    extracted_text += paragraph.text + "\n"
-            except ImportError:
-                extracted_text = "Word document processing not available - python-docx not installed"
-            except Exception as e:
-                extracted_text = f"Word document processing error: {str(e)}"
+            extracted_text = await run_in_threadpool(extract_docx_text, str(file_path))
         else:
             # For text files, read content
             try:
@@ -271,20 +399,19 @@ async def upload_document(file: UploadFile = File(...)):
         if not extracted_text or len(extracted_text.strip()) < 10:
             extracted_text = f"Document {file.filename} uploaded but text extraction was minimal or failed. This may be a scanned document or unsupported format."
         
-        print(f"Final extracted text length: {len(extracted_text)} characters")
-        print(f"Text preview: {extracted_text[:200]}...")
+        logger.debug("Final extracted text length: %d characters", len(extracted_text))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Text preview: %s...", extracted_text[:200])
         
         # Store document content for RAG
-        uploaded_documents[file.filename] = {
-            "content": extracted_text,
-            "file_path": str(file_path),
-            "upload_time": time.time()
-        }
+        upload_time = time.time()
+        await run_in_threadpool(uploaded_documents.add, file.filename, str(file_path), extracted_text, upload_time)
         
-        print(f"Document stored in uploaded_documents. Total documents: {len(uploaded_documents)}")
-        print(f"Document keys: {list(uploaded_documents.keys())}")
+        logger.info("Stored document %s. Total documents: %d", file.filename, len(uploaded_documents))
         
-        # Simple RAG response (no external API calls)
+        # Chunk and batch-embed the document for retrieval
+        chunk_count = await run_in_threadpool(document_index.add_document, file.filename, extracted_text, upload_time)
+        logger.debug("Indexed %d chunks for %s", chunk_count, file.filename)
         rag_response = f"Document {file.filename} uploaded and indexed for analysis"
         
         response_msg = "Document uploaded and analyzed successfully"
@@ -308,17 +435,15 @@ async def process_voice(file: UploadFile = File(...)):
         upload_dir.mkdir(exist_ok=True)
         audio_path = upload_dir / file.filename
         
-        with open(audio_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        await _save_upload(file, audio_path)
         
        
         speech_processor = get_speech_processor()
-        result = speech_processor.speech_to_text(str(audio_path))
+        result = await run_in_threadpool(speech_processor.speech_to_text, str(audio_path))
         
         if result["success"]:
             
-            response = ask_indian_legalgpt_fast(result["transcription"])
+            response = await run_in_threadpool(ask_indian_legalgpt_fast, result["transcription"])
             
             return {
                 "success": True,
@@ -349,13 +474,11 @@ async def speech_to_text_endpoint(audio_file: UploadFile = File(...), language:
         upload_dir.mkdir(exist_ok=True)
         audio_path = upload_dir / audio_file.filename
         
-        with open(audio_path, "wb") as buffer:
-            content = await audio_file.read()
-            buffer.write(content)
+        await _save_upload(audio_file, audio_path)
         
         # Process speech to text
         speech_processor = get_speech_processor()
-        result = speech_processor.speech_to_text(str(audio_path), language)
+        result = await run_in_threadpool(speech_processor.speech_to_text, str(audio_path), language)
         
         return result
     
@@ -373,10 +496,10 @@ async def text_to_speech_endpoint(payload: TextToSpeechRequest):
             upload_dir = Path("uploads")
             upload_dir.mkdir(exist_ok=True)
             output_path = upload_dir / f"tts_output_{int(time.time())}.wav"
-            result = speech_processor.text_to_speech(payload.text, str(output_path))
+            result = await run_in_threadpool(speech_processor.text_to_speech, payload.text, str(output_path))
         else:
             # Play directly
-            result = speech_processor.text_to_speech(payload.text)
+            result = await run_in_threadpool(speech_processor.text_to_speech, payload.text)
         
         return result
     
@@ -388,7 +511,7 @@ async def start_realtime_recording():
     """Start real-time speech recording"""
     try:
         speech_processor = get_speech_processor()
-        result = speech_processor.start_realtime_recording()
+        result = await run_in_threadpool(speech_processor.start_realtime_recording)
         return result
     
     except Exception as e:
@@ -399,7 +522,7 @@ async def stop_realtime_recording():
     """Stop real-time speech recording and get transcription"""
     try:
         speech_processor = get_speech_processor()
-        result = speech_processor.stop_realtime_recording()
+        result = await run_in_threadpool(speech_processor.stop_realtime_recording)
         
         # Get transcription from queue
         try:
@@ -429,7 +552,7 @@ async def analyze_document(request: DocumentAnalysisRequest):
     try:
        
         analyzer = get_document_analyzer()
-        analysis = analyzer.generate_legal_summary(request.text)
+        analysis = await run_in_threadpool(analyzer.generate_legal_summary, request.text)
         
         return {
             "analysis": analysis,
@@ -450,7 +573,8 @@ async def process_multimodal(request: MultimodalRequest):
     try:
        
         multimodal = get_multimodal_ai()
-        result = multimodal.process_multimodal_input(
+        result = await run_in_threadpool(
+            multimodal.process_multimodal_input,
             text_input=request.text_input,
             voice_input=request.voice_input,
             document_path=request.document_path
@@ -473,61 +597,91 @@ async def process_multimodal(request: MultimodalRequest):
 async def generate_document(request: DocumentGenerationRequest):
     """Generate a formal legal document from a user case description."""
     try:
-        content = generate_legal_document_fast(request.description, request.preferred_type)
+        content = await run_in_threadpool(generate_legal_document_fast, request.description, request.preferred_type)
         return {"content": content}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Document generation error: {str(e)}")
 
+FEATURES_JSON = json.dumps({
+    "advanced_features": {
+        "document_analysis": "Advanced legal document analysis with OCR",
+        "multimodal_ai": "Voice, text, and document processing",
+        "rag_enhancement": "Enhanced RAG with legal context",
+        "voice_interface": "Voice-based legal assistant",
+        "legal_summary_generation": "AI-generated legal summaries"
+    }
+}).encode()
+
 @app.get("/features")
 async def get_features():
     """Get available advanced features"""
-    return {
-        "advanced_features": {
-            "document_analysis": "Advanced legal document analysis with OCR",
-            "multimodal_ai": "Voice, text, and document processing",
-            "rag_enhancement": "Enhanced RAG with legal context",
-            "voice_interface": "Voice-based legal assistant",
-            "legal_summary_generation": "AI-generated legal summaries"
-        }
-    }
+    return Response(FEATURES_JSON, media_type="application/json")
 
 @app.get("/documents")
-async def list_documents():
+def list_documents():
     """List all uploaded documents"""
-    return {
-        "documents": list(uploaded_documents.keys()),
-        "count": len(uploaded_documents),
-        "details": {
-            filename: {
-                "upload_time": doc_info["upload_time"],
-                "content_length": len(doc_info["content"]),
-                "preview": doc_info["content"][:200] + "..." if len(doc_info["content"]) > 200 else doc_info["content"]
-            }
-            for filename, doc_info in uploaded_documents.items()
+    # Plain def: FastAPI runs it in the threadpool, since refresh and the mmap reads block
+    documents = uploaded_documents.refresh()
+    details = {}
+    for filename, upload_time, content_length in zip(documents.names, documents.upload_times, documents.lengths):
+        preview = uploaded_documents.read(filename, 200)
+        details[filename] = {
+            "upload_time": float(upload_time),
+            "content_length": int(content_length),
+            "preview": preview + "..." if content_length > 200 else preview
         }
-    }
+    return JSON_RESPONSE_CLASS({
+        "documents": list(documents.names),
+        "count": len(documents),
+        "details": details
+    })
+
+# Domains in priority order; the first domain with a matching keyword wins
+LEGAL_DOMAIN_KEYWORDS = [
+    ("Constitutional Law", ["article", "constitution", "fundamental rights"]),
+    ("Criminal Law", ["section", "ipc", "criminal", "punishment"]),
+    ("Consumer Law", ["consumer", "complaint", "defective"]),
+    ("Family Law", ["divorce", "marriage", "custody", "maintenance"]),
+    ("Property Law", ["property", "registration", "sale deed"]),
+]
 
+def _build_domain_automaton():
+    """Compile every domain keyword into one Aho-Corasick automaton (None if pyahocorasick is unavailable)"""
+    if not HAS_AHOCORASICK:
+        return None
+    automaton = ahocorasick.Automaton()
+    for priority, (_, keywords) in enumerate(LEGAL_DOMAIN_KEYWORDS):
+        for keyword in keywords:
+            automaton.add_word(keyword, priority)
+    automaton.make_automaton()
+    return automaton
+
+domain_automaton = _build_domain_automaton()
+
+@lru_cache(maxsize=4096)
 def _classify_legal_domain(query: str) -> str:
     """Classify the legal domain of the query"""
     query_lower = query.lower()
     
-    if any(word in query_lower for word in ["article", "constitution", "fundamental rights"]):
-        return "Constitutional Law"
-    elif any(word in query_lower for word in ["section", "ipc", "criminal", "punishment"]):
-        return "Criminal Law"
-    elif any(word in query_lower for word in ["consumer", "complaint", "defective"]):
-        return "Consumer Law"
-    elif any(word in query_lower for word in ["divorce", "marriage", "custody", "maintenance"]):
-        return "Family Law"
-    elif any(word in query_lower for word in ["property", "registration", "sale deed"]):
-        return "Property Law"
-    else:
-        return "General Legal"
+    if domain_automaton is not None:
+        # Single pass over the query for all keywords at once
+        priorities = [priority for _, priority in domain_automaton.iter(query_lower)]
+        return LEGAL_DOMAIN_KEYWORDS[min(priorities)][0] if priorities else "General Legal"
+    
+    for domain, keywords in LEGAL_DOMAIN_KEYWORDS:
+        if any(word in query_lower for word in keywords):
+            return domain
+    return "General Legal"
 
 if __name__ == "__main__":
-    print("🚀 Starting Advanced Legal AI Assistant...")
+    _configure_logging()
+    logger.info("🚀 Starting Advanced Legal AI Assistant...")
    
     
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
-    uvicorn.run("main:app", host=host, port=port, reload=False)
+    # Single worker by default: /start-recording and /stop-recording keep their state in-process,
+    # and every worker loads its own embedding model and extraction pool
+    workers = int(os.getenv("WORKERS", 1))
+    loop = "asyncio" if sys.platform == "win32" else "uvloop"
+    uvicorn.run("main:app", host=host, port=port, workers=workers, loop=loop, http="httptools", reload=False)
@@ -114,28 +114,38 @@ def _groq_chat_with_autocontinue(messages: list[dict]) -> str:
         return ""
 
 
-def ask_groq_fast(question: str) -> str:
-    """Fast Groq API call with auto-continue to avoid truncation"""
+def knowledge_base_answer(question: str) -> str:
+    """Canned answer from the built-in knowledge base, used when Groq is unavailable"""
+    knowledge = get_relevant_knowledge(question)
+    return f"Based on Indian legal knowledge: {knowledge}"
+
+def ask_groq_fast(question: str, document_context: str | None = None) -> str | None:
+    """Fast Groq API call with auto-continue to avoid truncation.
+    Document context goes before the question so repeat questions over the same
+    documents share a prompt prefix that the provider's prefix cache can reuse.
+    Returns None when Groq fails or returns nothing."""
     try:
+        prompt = (
+            "Answer this legal question in the context of Indian law. "
+            "Be thorough, structured with headings and steps, and concise where possible.\n\n"
+        )
+        if document_context:
+            prompt += (
+                f"Context from uploaded documents:\n{document_context}\n\n"
+                "Please answer the question based on the uploaded documents. If the documents don't "
+                "contain relevant information, provide general Indian legal guidance.\n\n"
+            )
         messages = [
             {
                 "role": "user",
-                "content": (
-                    "Answer this legal question in the context of Indian law. "
-                    "Be thorough, structured with headings and steps, and concise where possible.\n\n"
-                    f"Question: {question}"
-                ),
+                "content": prompt + f"Question: {question}",
             }
         ]
 
         content = _groq_chat_with_autocontinue(messages)
-        if content:
-            return content
-        knowledge = get_relevant_knowledge(question)
-        return f"Based on Indian legal knowledge: {knowledge}"
+        return content or None
     except Exception:
-        knowledge = get_relevant_knowledge(question)
-        return f"Based on Indian legal knowledge: {knowledge}"
+        return None
 
 
 def generate_legal_document_fast(case_description: str, preferred_type: str | None = None) -> str:
@@ -172,11 +182,12 @@ def ask_indian_legalgpt_fast(query: str) -> str:
     try:
         # Try Groq first (fast)
         response = ask_groq_fast(query)
-        return response
-    except Exception as e:
-        # Fallback to knowledge base
-        knowledge = get_relevant_knowledge(query)
-        return f"Based on Indian legal knowledge: {knowledge}"
+        if response:
+            return response
+    except Exception:
+        pass
+    # Fallback to knowledge base
+    return knowledge_base_answer(query)
 
 def upload_document_to_rag_fast(file_path: str) -> str:
     """Fast document upload (placeholder)"""